@@ -1,11 +1,12 @@
 import asyncio
 import subprocess
 from concurrent.futures import ThreadPoolExecutor
-from pathlib import Path, PosixPath
+from contextlib import asynccontextmanager
+from pathlib import Path
 
 import chromadb
 import numpy as np
-import pandas as pd
+import pyarrow.parquet as pq
 from chromadb.utils import embedding_functions
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -14,23 +15,45 @@ from plantuml_generator import PlantUMLGenerator
 from pydantic import BaseModel
 from qa_system import QAProcessor
 from repo_parser import RepositoryParser
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
 
 CHROMA_DB_PATH = "./.chroma_db"
-chroma_client = chromadb.PersistentClient(
-    path=CHROMA_DB_PATH,
-    settings=chromadb.Settings(
-        is_persistent=True,
-        persist_directory=CHROMA_DB_PATH,
-        anonymized_telemetry=False,
-        allow_reset=False,
-    ),
-)
+chroma_client = None
 
 embedding_function = embedding_functions.DefaultEmbeddingFunction()
 
 
-app = FastAPI()
+THREAD_POOL_WORKERS = 4
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Construct the persistent client exactly once per process, at startup
+    # rather than at import, so tooling that imports this module stays cheap.
+    global chroma_client
+    chroma_client = chromadb.PersistentClient(
+        path=CHROMA_DB_PATH,
+        settings=chromadb.Settings(
+            is_persistent=True,
+            persist_directory=CHROMA_DB_PATH,
+            anonymized_telemetry=False,
+            allow_reset=False,
+        ),
+    )
+    # One sized pool behind every asyncio.to_thread call; Chroma serializes
+    # writers per collection anyway, so more threads would only churn.
+    executor = ThreadPoolExecutor(max_workers=THREAD_POOL_WORKERS)
+    asyncio.get_running_loop().set_default_executor(executor)
+    yield
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -41,6 +64,27 @@ app.add_middleware(
 
 
 REPO_BASE_PATH = Path("./.repositories")
+REPO_BASE_PATH.mkdir(exist_ok=True)
+
+# Serve every repository's diagrams from one mount; remounting per request
+# mutates the router and leaks one entry per processed repository.
+app.mount("/diagrams", StaticFiles(directory=str(REPO_BASE_PATH)), name="diagrams")
+
+DIAGRAM_FILES = {
+    "class": "class_diagram.png",
+    "sequence": "sequence_diagram.png",
+    "component": "component_diagram.png",
+    "context": "context_diagram.png",
+    "container": "container_diagram.png",
+    "c4_component": "c4_component_diagram.png",
+}
+
+
+def diagram_urls(repo_name):
+    return {
+        kind: f"/diagrams/{repo_name}/diagrams/{filename}"
+        for kind, filename in DIAGRAM_FILES.items()
+    }
 
 
 class RepoInput(BaseModel):
@@ -54,89 +98,86 @@ class QuestionInput(BaseModel):
     openai_key: str
 
 
-def get_commit_hash(repo_path, ref="HEAD"):
-    try:
-        commit_hash = (
-            subprocess.check_output(["git", "-C", str(repo_path), "rev-parse", ref])
-            .decode()
-            .strip()
-        )
-        return commit_hash
-    except subprocess.CalledProcessError:
-        print(f"Warning: Could not retrieve commit hash for {ref}")
-        return None
-
-
-def get_remote_main_branch(repo_path):
-    try:
-        branches = (
-            subprocess.check_output(["git", "-C", str(repo_path), "branch", "-r"])
-            .decode()
-            .strip()
-            .split("\n")
-        )
+def _update_repo_pygit2(repo_path):
+    repo = pygit2.Repository(str(repo_path))
+    local_commit = str(repo.head.target)
 
-        branches = [b.strip() for b in branches]
+    repo.remotes["origin"].fetch()
+    fetch_head = repo.lookup_reference("FETCH_HEAD").target
+    remote_commit = str(fetch_head)
 
-        if "origin/main" in branches:
-            return "origin/main"
-        elif "origin/master" in branches:
-            return "origin/master"
-        else:
-            print("Error: No main or master branch found in remote.")
-            return None
-    except subprocess.CalledProcessError:
-        print("Error: Could not fetch remote branches.")
-        return None
+    if local_commit == remote_commit:
+        print("Repository is up to date.")
+        return []
 
+    print("Updating repository from origin...")
+    diff = repo.diff(local_commit, remote_commit)
+    changed_files = sorted({delta.new_file.path for delta in diff.deltas})
+    repo.reset(fetch_head, pygit2.GIT_RESET_HARD)
+    return changed_files
 
-def clone_or_update_repo(repo_url, repo_path):
-    if repo_path.is_dir() and (repo_path / ".git").is_dir():
-        print("Checking for updates...")
 
-        subprocess.run(["git", "-C", repo_path, "fetch", "origin"], check=True)
+async def _run_git(*args, capture=False):
+    """Run a git command without blocking the event loop."""
+    proc = await asyncio.create_subprocess_exec(
+        "git",
+        *args,
+        stdout=asyncio.subprocess.PIPE if capture else None,
+    )
+    stdout, _ = await proc.communicate()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, ["git", *args])
+    return stdout.decode() if capture else None
 
-        remote_branch = get_remote_main_branch(repo_path)
-        if remote_branch is None:
-            return []
 
-        local_commit = get_commit_hash(repo_path)
-        remote_commit = get_commit_hash(repo_path, remote_branch)
+async def _update_repo_subprocess(repo_path):
+    # Fetching origin's HEAD resolves the default branch for us, so no
+    # branch -r round-trip is needed, and --depth=1 skips old history.
+    await _run_git("-C", str(repo_path), "fetch", "--depth=1", "origin", "HEAD")
 
-        if remote_commit is None:
-            print(f"Error: Could not retrieve remote commit for {remote_branch}.")
-            return []
+    try:
+        local_commit, remote_commit = (
+            await _run_git(
+                "-C", str(repo_path), "rev-parse", "HEAD", "FETCH_HEAD", capture=True
+            )
+        ).split()
+    except subprocess.CalledProcessError:
+        print("Error: Could not resolve local and fetched commits.")
+        return []
+
+    if local_commit == remote_commit:
+        print("Repository is up to date.")
+        return []
+
+    print("Updating repository from origin...")
+    changed_files = (
+        await _run_git(
+            "-C",
+            str(repo_path),
+            "diff",
+            "--name-only",
+            local_commit,
+            remote_commit,
+            capture=True,
+        )
+    ).splitlines()
+    await _run_git("-C", str(repo_path), "reset", "--hard", "FETCH_HEAD")
+    return changed_files
 
-        if local_commit == remote_commit:
-            print("Repository is up to date.")
-            return []
 
-        print(f"Updating repository from {remote_branch}...")
-        subprocess.run(
-            ["git", "-C", repo_path, "pull", "origin", remote_branch.split("/")[-1]],
-            check=True,
-        )
+async def clone_or_update_repo(repo_url, repo_path):
+    if repo_path.is_dir() and (repo_path / ".git").is_dir():
+        print("Checking for updates...")
+        if pygit2 is not None:
+            return await asyncio.to_thread(_update_repo_pygit2, repo_path)
+        return await _update_repo_subprocess(repo_path)
 
-        changed_files = (
-            subprocess.check_output(
-                [
-                    "git",
-                    "-C",
-                    repo_path,
-                    "diff",
-                    "--name-only",
-                    local_commit,
-                    remote_commit,
-                ]
-            )
-            .decode()
-            .splitlines()
-        )
-        return changed_files
+    print("Cloning repository...")
+    if pygit2 is not None:
+        await asyncio.to_thread(pygit2.clone_repository, repo_url, str(repo_path))
     else:
-        print("Cloning repository...")
-        subprocess.run(["git", "clone", repo_url, str(repo_path)], check=True)
-        return None
+        await _run_git("clone", repo_url, str(repo_path))
+    return None
 
 
 def validate_repo_metadata(repo_path):
@@ -146,101 +187,132 @@ def validate_repo_metadata(repo_path):
     return parquet_path
 
 
-def reduce_embedding_size(embeddings, new_dim=128):
-    pca = PCA(n_components=new_dim)
-    return pca.fit_transform(np.array(embeddings))
+# Above this row count a full randomized SVD gets memory-hungry; switch to
+# mini-batch fitting instead.
+INCREMENTAL_PCA_ROWS = 100_000
+
+
+def reduce_embedding_size(embeddings, new_dim=128, model_path=None):
+    X = np.asarray(embeddings, dtype=np.float32)
+    if new_dim >= X.shape[1]:
+        return X
+
+    # Reusing a persisted projection keeps incremental ingests comparable to
+    # vectors reduced on earlier runs; refitting would shift the coordinates.
+    if model_path is not None:
+        model_path = Path(model_path)
+        if model_path.exists():
+            npz = np.load(model_path)
+            return ((X - npz["mean"]) @ npz["components"].T).astype(np.float16)
+
+    if X.shape[0] > INCREMENTAL_PCA_ROWS:
+        pca = IncrementalPCA(n_components=new_dim, batch_size=4096)
+    else:
+        pca = PCA(n_components=new_dim, svd_solver="randomized", random_state=0)
+    reduced = pca.fit_transform(X)
+
+    if model_path is not None:
+        np.savez(
+            model_path,
+            mean=pca.mean_.astype(np.float32),
+            components=pca.components_.astype(np.float32),
+        )
+    # float16 is plenty for cosine-style similarity and halves the memory
+    # traffic of every downstream insert and scan.
+    return reduced.astype(np.float16)
+
+
+UPSERT_BATCH_SIZE = 250
+MAX_CONCURRENT_UPSERTS = 4
 
 
-async def upsert_batch_async(collection, batch):
+async def upsert_batch_async(collection, batch, semaphore):
     ids = batch["id"].tolist()
-    metadatas = batch.drop(columns=["code", "docstring", "parent"]).to_dict(
-        orient="records"
+    # Embeddings were computed in one batched pass at parse time; handing
+    # them to Chroma directly skips its per-upsert embedding function.
+    embeddings = np.stack(batch["embedding"].to_numpy())
+    metadata_cols = [
+        c for c in batch.columns if c not in ("code", "docstring", "parent", "embedding")
+    ]
+    metadatas = batch[metadata_cols].to_dict(orient="records")
+
+    docs = batch["code"].fillna("").astype(str) + "\n"
+    docstrings = batch["docstring"].fillna("").astype(str)
+    parents = batch["parent"].fillna("").astype(str)
+    docs = docs.where(
+        docstrings.eq(""), docs + "\nDocstring:\n" + docstrings + "\n"
     )
-    documents = []
-    for _, row in batch.iterrows():
-        doc_text = f"{row['code']}\n"
-        if "docstring" in row and row["docstring"]:
-            doc_text += f"\nDocstring:\n{row['docstring']}\n"
-        if "parent" in row and row["parent"]:
-            doc_text += f"\nParent Class/Module: {row['parent']}\n"
-        documents.append(doc_text)
-    await asyncio.to_thread(
-        collection.upsert, ids=ids, metadatas=metadatas, documents=documents
+    docs = docs.where(
+        parents.eq(""), docs + "\nParent Class/Module: " + parents + "\n"
     )
+    documents = docs.tolist()
+    async with semaphore:
+        await asyncio.to_thread(
+            collection.upsert,
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=documents,
+        )
 
 
 async def process_embeddings_async(
-    repo_name, parquet_path, changed_files, batch_size=100
+    repo_name, parquet_path, changed_files, batch_size=UPSERT_BATCH_SIZE
 ):
-    df_embeddings = pd.read_parquet(parquet_path)
+    # Read only the columns this path consumes and push the changed-files
+    # filter down to the parquet reader so untouched row groups are skipped.
+    columns = [
+        "id",
+        "name",
+        "type",
+        "file_path",
+        "start_line",
+        "end_line",
+        "code",
+        "parent",
+        "docstring",
+        "embedding",
+    ]
+    filters = [("file_path", "in", list(changed_files))] if changed_files else None
+    table = pq.read_table(parquet_path, columns=columns, filters=filters)
+    df_embeddings = table.to_pandas(split_blocks=True, self_destruct=True)
     if df_embeddings.empty:
         raise HTTPException(status_code=500, detail="No embeddings found.")
 
-    if changed_files:
-        df_embeddings = df_embeddings[df_embeddings["file_path"].isin(changed_files)]
-
+    # Vectors are normalized at encode time, so inner product equals cosine
+    # and skips the per-comparison re-normalization Chroma's cosine space does.
     collection = chroma_client.get_or_create_collection(
-        repo_name, embedding_function=embedding_function
+        repo_name,
+        embedding_function=embedding_function,
+        metadata={"hnsw:space": "ip"},
     )
 
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPSERTS)
     tasks = []
     for start in range(0, len(df_embeddings), batch_size):
         end = min(start + batch_size, len(df_embeddings))
         batch = df_embeddings.iloc[start:end]
-        tasks.append(upsert_batch_async(collection, batch))
+        tasks.append(upsert_batch_async(collection, batch, semaphore))
 
     await asyncio.gather(*tasks)
 
 
 def generate_diagrams(repo_path):
     diagram_generator = PlantUMLGenerator(repo_path)
-    diagrams = diagram_generator.generate_all()
-
-    diagram_path = repo_path / "diagrams"
-    if diagram_path.exists():
-        app.mount(
-            "/diagrams", StaticFiles(directory=str(diagram_path)), name="diagrams"
-        )
-
-    return diagrams
+    return diagram_generator.generate_all()
 
 
 @app.post("/process_repository/")
-def process_repository(input_data: RepoInput):
+async def process_repository(input_data: RepoInput):
     repo_url = input_data.repo_url
     repo_name = repo_url.split("/")[-1].replace(".git", "").replace("-", "_")
     repo_path = REPO_BASE_PATH / repo_name
 
-    diagram_path = repo_path / "diagrams"
-    if diagram_path.exists():
-        app.mount(
-            "/diagrams", StaticFiles(directory=str(diagram_path)), name="diagrams"
-        )
-
-    changed_files = clone_or_update_repo(repo_url, repo_path)
+    changed_files = await clone_or_update_repo(repo_url, repo_path)
     if changed_files == []:
         return {
             "message": "Repository is up to date.",
-            "diagrams": {
-                "class": PosixPath(
-                    f"/Users/kritikadatar/PycharmProjects/ICRQE/src/backend/.repositories/{repo_name}/diagrams/class_diagram.png"
-                ),
-                "component": PosixPath(
-                    f"/Users/kritikadatar/PycharmProjects/ICRQE/src/backend/.repositories/{repo_name}/diagrams/component_diagram.png"
-                ),
-                "sequence": PosixPath(
-                    f"/Users/kritikadatar/PycharmProjects/ICRQE/src/backend/.repositories/{repo_name}/diagrams/sequence_diagram.png"
-                ),
-                "context": PosixPath(
-                    f"/Users/kritikadatar/PycharmProjects/ICRQE/src/backend/.repositories/{repo_name}/diagrams/context_diagram.png"
-                ),
-                "container": PosixPath(
-                    f"/Users/kritikadatar/PycharmProjects/ICRQE/src/backend/.repositories/{repo_name}/diagrams/container_diagram.png"
-                ),
-                "c4_component": PosixPath(
-                    f"/Users/kritikadatar/PycharmProjects/ICRQE/src/backend/.repositories/{repo_name}/diagrams/c4_component_diagram.png"
-                ),
-            },
+            "diagrams": diagram_urls(repo_name),
         }
 
     changed_files = None
@@ -248,16 +320,19 @@ def process_repository(input_data: RepoInput):
     parquet_path = repo_path / "embeddings.parquet"
 
     parser = RepositoryParser(repo_path)
-    parser.extract_code_structure(changed_files)
-    asyncio.run(process_embeddings_async(repo_name, parquet_path, changed_files))
+    await asyncio.to_thread(parser.extract_code_structure, changed_files)
+    await process_embeddings_async(repo_name, parquet_path, changed_files)
 
-    diagrams = generate_diagrams(repo_path)
+    await asyncio.to_thread(generate_diagrams, repo_path)
 
-    return {"message": "Repository processed successfully", "diagrams": diagrams}
+    return {
+        "message": "Repository processed successfully",
+        "diagrams": diagram_urls(repo_name),
+    }
 
 
 @app.post("/ask_question/")
-def ask_question(input_data: QuestionInput):
+async def ask_question(input_data: QuestionInput):
     repo_name = input_data.repo_name.replace("-", "_")
     repo_path = REPO_BASE_PATH / repo_name
 
@@ -267,8 +342,16 @@ def ask_question(input_data: QuestionInput):
     if not collection:
         raise HTTPException(status_code=404, detail="ChromaDB collection not found.")
 
-    qa_processor = QAProcessor(collection, input_data.openai_key, repo_path)
-    answer = qa_processor.answer_question(input_data.question)
+    # Per-repo semantic cache: near-duplicate questions reuse stored answers
+    # instead of paying for another completion.
+    qa_cache = chroma_client.get_or_create_collection(
+        f"{repo_name}_qa_cache", metadata={"hnsw:space": "cosine"}
+    )
+
+    qa_processor = QAProcessor(
+        collection, input_data.openai_key, repo_path, qa_cache=qa_cache
+    )
+    answer = await qa_processor.answer_question(input_data.question)
 
     return {"answer": answer}
 
@@ -1,12 +1,16 @@
 import ast
+import functools
+import hashlib
 import os
+import pickle
 import re
 import subprocess
+import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib.metadata import distributions
 from pathlib import Path
 
-import pkg_resources
-
 # Map known API libraries to external services
 KNOWN_EXTERNAL_SERVICES = {
     "requests": "HTTP API",
@@ -27,102 +31,178 @@ COMPONENT_PUML = "c4_component.puml"
 
 OUTPUT_IMAGES = ["c4_context.png", "c4_container.png", "c4_component.png"]
 
+# Directories whose contents dominate file counts but never belong in diagrams
+IGNORE_DIRS = {".git", ".venv", "venv", "node_modules", "site-packages", "build", "dist", "__pycache__"}
+
+MIN_FILES_FOR_PARALLEL_PARSE = 32
+
+
+def _parse_pool_class():
+    """Pick the executor for the parallel parse path.
+
+    On free-threaded builds (3.13t+) ast.parse runs concurrently in plain
+    threads, so the pickling and fork overhead of worker processes can be
+    skipped entirely; on GIL builds processes remain the only way to get
+    parallel parsing.
+    """
+    try:
+        if not sys._is_gil_enabled():
+            return ThreadPoolExecutor
+    except AttributeError:
+        pass
+    return ProcessPoolExecutor
+
+# Fixed line templates for the C4 generators. printf-style interpolation
+# beats re-evaluating an f-string per row when the same template runs for
+# every module and class in a large repository.
+_CONTAINER_LINE = '    Container(%s, "%s", "Python Module")\n'
+_COMPONENT_LINE = '    Component(%s, "%s", "Python Class")\n'
+_INHERITS_LINE = '%s -> %s : "Inherits"\n'
+_EXTERNAL_LINES = 'System_Ext(%s, "%s", "External service")\napp -> %s : "Interacts with %s"\n'
+
+# Imported modules that indicate a dependency on an external service
+EXTERNAL_DEPENDENCY_MODULES = {
+    "boto3": "AWS Services",
+    "psycopg2": "PostgreSQL",
+    "sqlalchemy": "PostgreSQL",
+    "redis": "Redis",
+}
 
-def render_plantuml(puml_path):
-    output_image_path = puml_path.with_suffix(".png")
-    subprocess.run(["plantuml", "-tpng", str(puml_path)], check=True)
-    return output_image_path
 
+class _FileVisitor(ast.NodeVisitor):
+    """Single traversal that extracts everything the diagram builders need."""
+
+    def __init__(self, summary):
+        self.summary = summary
+        self._class = None
+        self._function = None
+
+    def visit_ClassDef(self, node):
+        self.summary["classes"][node.name] = [
+            n.name for n in node.body if type(n) is ast.FunctionDef
+        ]
+        for base in node.bases:
+            if type(base) is ast.Name:
+                self.summary["bases"].append((node.name, base.id))
+        previous = self._class
+        self._class = node.name
+        self.generic_visit(node)
+        self._class = previous
+
+    def visit_FunctionDef(self, node):
+        self.summary["functions"].append(node.name)
+        previous = self._function
+        self._function = node.name
+        self.generic_visit(node)
+        self._function = previous
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node):
+        # Tuple keys hash cheaper than f-string joins; the "Class.function"
+        # label is only built when a diagram is serialized. type() is enough
+        # here since ast node classes are never subclassed.
+        if self._function is not None and type(node.func) is ast.Attribute:
+            self.summary["calls"].setdefault(
+                (self._class, self._function), set()
+            ).add(node.func.attr)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.summary["imports"].add(alias.name.split(".")[0])
+            if self._class is None and self._function is None:
+                self.summary["module_deps"].add(alias.name)
+
+    def visit_ImportFrom(self, node):
+        if node.module:
+            self.summary["imports"].add(node.module.split(".")[0])
+            if self._class is None and self._function is None:
+                self.summary["module_deps"].add(node.module)
+
+
+def _read_source(file_path):
+    try:
+        return file_path.read_bytes()
+    except OSError as e:
+        print(f"Error reading {file_path}: {e}")
+        return None
+
+
+def _summarize_source(file_path, source):
+    try:
+        tree = ast.parse(source)
+    except Exception as e:
+        print(f"Error parsing {file_path}: {e}")
+        return None
+    summary = {
+        "classes": {},
+        "bases": [],
+        "functions": [],
+        "calls": {},
+        "imports": set(),
+        "module_deps": set(),
+    }
+    _FileVisitor(summary).visit(tree)
+    return summary
 
-def get_installed_packages():
-    """Retrieve a list of installed packages from the environment."""
-    installed_packages = {pkg.key for pkg in pkg_resources.working_set}
-    return installed_packages
-
-
-def extract_imports_from_code(directory):
-    """Parse Python files and extract imported modules."""
-    imported_modules = set()
-
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".py") and not file.startswith("__init__"):
-                file_path = os.path.join(root, file)
-                with open(file_path, "r", encoding="utf-8") as f:
-                    try:
-                        tree = ast.parse(f.read(), filename=file_path)
-                        for node in ast.walk(tree):
-                            if isinstance(node, ast.Import):
-                                for alias in node.names:
-                                    imported_modules.add(alias.name.split(".")[0])
-                            elif isinstance(node, ast.ImportFrom):
-                                imported_modules.add(
-                                    node.module.split(".")[0] if node.module else ""
-                                )
-                    except SyntaxError:
-                        print(f"Skipping {file_path} due to syntax error.")
-
-    return imported_modules
 
+# Bumped whenever the summary layout changes, so stale cache entries miss.
+SUMMARY_CACHE_VERSION = 2
 
-def detect_external_services(imported_modules):
-    """Detect external APIs based on known API libraries."""
-    installed_packages = get_installed_packages()
-    detected_services = {}
 
-    for module in imported_modules:
-        if module in KNOWN_EXTERNAL_SERVICES:
-            detected_services[module] = KNOWN_EXTERNAL_SERVICES[module]
-        elif module in installed_packages:
-            detected_services[module] = f"Third-Party Library ({module})"
+def _cached_summarize(file_path, source, cache_dir):
+    """Summarize a file, reusing the on-disk result for unchanged contents."""
+    digest = hashlib.sha256(source).hexdigest()
+    cache_path = cache_dir / f"{digest}.v{SUMMARY_CACHE_VERSION}.pkl"
+    if cache_path.exists():
+        try:
+            return pickle.loads(cache_path.read_bytes())
+        except Exception:
+            pass
+    summary = _summarize_source(file_path, source)
+    if summary is not None:
+        cache_path.write_bytes(pickle.dumps(summary))
+    return summary
 
-    return detected_services
 
+def _parse_file(file_path, cache_dir):
+    """Read, parse and summarize one file; must stay module-level to be picklable."""
+    source = _read_source(file_path)
+    if source is None:
+        return None
+    return _cached_summarize(file_path, source, cache_dir)
 
-def extract_python_structure(directory):
-    """Extracts modules, classes, and functions to structure the architecture."""
-    architecture = {
-        "modules": set(),
-        "classes": set(),
-        "functions": set(),
-        "dependencies": set(),
-    }
 
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".py") and not file.startswith("__init__"):
-                file_path = os.path.join(root, file)
-                module_name = (
-                    os.path.relpath(file_path, directory)
-                    .replace("/", ".")
-                    .replace("\\", ".")
-                    .replace(".py", "")
-                )
-                architecture["modules"].add(module_name)
+def render_plantuml(*puml_paths):
+    """Render any number of .puml files with a single PlantUML invocation."""
+    subprocess.run(["plantuml", "-tpng", *map(str, puml_paths)], check=True)
+    return [path.with_suffix(".png") for path in puml_paths]
 
-                with open(file_path, "r", encoding="utf-8") as f:
-                    try:
-                        tree = ast.parse(f.read(), filename=file_path)
-                        for node in ast.walk(tree):
-                            if isinstance(node, ast.ClassDef):
-                                class_name = f"{module_name}.{node.name}"
-                                architecture["classes"].add(class_name)
 
-                                # Extract class dependencies (parent classes)
-                                for base in node.bases:
-                                    if isinstance(base, ast.Name):
-                                        parent = base.id
-                                        architecture["dependencies"].add(
-                                            (class_name, parent)
-                                        )
+@functools.lru_cache(maxsize=1)
+def get_installed_packages():
+    """Retrieve the installed package names, scanning the environment once."""
+    return {
+        dist.metadata["Name"].lower()
+        for dist in distributions()
+        if dist.metadata["Name"]
+    }
 
-                            if isinstance(node, ast.FunctionDef):
-                                func_name = f"{module_name}.{node.name}()"
-                                architecture["functions"].add(func_name)
-                    except SyntaxError:
-                        print(f"Skipping {file_path} due to syntax error.")
 
-    return architecture
+def detect_external_services(imported_modules):
+    """Detect external APIs based on known API libraries."""
+    imported_modules = set(imported_modules)
+    known = imported_modules & KNOWN_EXTERNAL_SERVICES.keys()
+    third_party = (
+        imported_modules & get_installed_packages() - KNOWN_EXTERNAL_SERVICES.keys()
+    )
+
+    detected_services = {module: KNOWN_EXTERNAL_SERVICES[module] for module in known}
+    detected_services.update(
+        {module: f"Third-Party Library ({module})" for module in third_party}
+    )
+    return detected_services
 
 
 class PlantUMLGenerator:
@@ -130,17 +210,77 @@ class PlantUMLGenerator:
         self.repo_path = Path(repo_path).resolve()
         self.output_dir = self.repo_path / "diagrams"
         os.makedirs(self.output_dir, exist_ok=True)
+        self._file_summaries = None
+        self._py_files = None
+
+    def _iter_py_files(self):
+        """Walk the repository once, pruning vendored and build directories."""
+        if self._py_files is None:
+            py_files = []
+            stack = [str(self.repo_path)]
+            while stack:
+                directory = stack.pop()
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            # DirEntry answers is_dir from the getdents data,
+                            # so no extra stat call is issued per entry.
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name not in IGNORE_DIRS:
+                                    stack.append(entry.path)
+                            elif entry.name.endswith(".py"):
+                                py_files.append(Path(entry.path))
+                except OSError as e:
+                    print(f"Error scanning {directory}: {e}")
+            self._py_files = py_files
+        return self._py_files
+
+    def _scan_repo(self):
+        """Read, parse and summarize every Python file exactly once."""
+        if self._file_summaries is None:
+            cache_dir = self.output_dir / ".ast_cache"
+            cache_dir.mkdir(exist_ok=True)
+            paths = self._iter_py_files()
+            if len(paths) < MIN_FILES_FOR_PARALLEL_PARSE:
+                # Below this, forking workers costs more than it saves. The
+                # reads are still overlapped in threads, since opening many
+                # small files is latency-bound rather than CPU-bound.
+                with ThreadPoolExecutor(
+                    max_workers=min(32, len(paths) or 1)
+                ) as executor:
+                    sources = list(executor.map(_read_source, paths))
+                summaries = [
+                    None
+                    if source is None
+                    else _cached_summarize(path, source, cache_dir)
+                    for path, source in zip(paths, sources)
+                ]
+            else:
+                workers = os.cpu_count() or 1
+                chunksize = max(1, len(paths) // (workers * 4))
+                parse = functools.partial(_parse_file, cache_dir=cache_dir)
+                with _parse_pool_class()(max_workers=workers) as executor:
+                    summaries = list(executor.map(parse, paths, chunksize=chunksize))
+            self._file_summaries = [
+                (path, summary)
+                for path, summary in zip(paths, summaries)
+                if summary is not None
+            ]
+        return self._file_summaries
 
     def generate_all(self):
         # Extract architecture from the codebase
-        architecture_data = extract_python_structure(self.repo_path)
+        architecture_data = self.extract_python_structure()
 
         # Extract imported modules from the Python project
-        imported_modules = extract_imports_from_code(self.repo_path)
+        imported_modules = self.extract_imports_from_code()
 
         # Detect external APIs based on known services
         external_services = detect_external_services(imported_modules)
-        diagrams = {
+
+        # Write all six .puml files first, then render them with a single
+        # PlantUML invocation so the JVM startup cost is paid exactly once.
+        puml_paths = {
             "class": self.generate_class_diagram(),
             "sequence": self.generate_sequence_diagram(),
             "component": self.generate_component_diagram(),
@@ -150,232 +290,186 @@ class PlantUMLGenerator:
             ),
             "c4_component": self.generate_c4_component_diagram(architecture_data),
         }
-        return diagrams
+        render_plantuml(*puml_paths.values())
+        return {kind: path.with_suffix(".png") for kind, path in puml_paths.items()}
 
     def generate_class_diagram(self):
         class_diagram_path = self.output_dir / "class_diagram.puml"
         classes = self.extract_classes()
 
-        with open(class_diagram_path, "w") as f:
-            f.write("@startuml\n")
-            for class_name, methods in classes.items():
-                f.write(f"class {class_name} {{\n")
-                for method in methods:
-                    f.write(f"  +{method}()\n")
-                f.write("}\n")
-            f.write("@enduml\n")
+        parts = ["@startuml\n"]
+        for class_name, methods in classes.items():
+            parts.append(f"class {class_name} {{\n")
+            parts.extend(f"  +{method}()\n" for method in methods)
+            parts.append("}\n")
+        parts.append("@enduml\n")
+        class_diagram_path.write_text("".join(parts))
 
-        return render_plantuml(class_diagram_path)
+        return class_diagram_path
 
     def generate_sequence_diagram(self):
         sequence_diagram_path = self.output_dir / "sequence_diagram.puml"
         calls = self.extract_function_calls()
 
-        with open(sequence_diagram_path, "w") as f:
-            f.write("@startuml\n")
-            for caller, callees in calls.items():
-                for callee in callees:
-                    f.write(f"{caller} -> {callee}: calls\n")
-            f.write("@enduml\n")
+        parts = ["@startuml\n"]
+        for (class_name, function_name), callees in calls.items():
+            caller = f"{class_name}.{function_name}"
+            parts.extend(f"{caller} -> {callee}: calls\n" for callee in callees)
+        parts.append("@enduml\n")
+        sequence_diagram_path.write_text("".join(parts))
 
-        return render_plantuml(sequence_diagram_path)
+        return sequence_diagram_path
 
     def generate_component_diagram(self):
         component_diagram_path = self.output_dir / "component_diagram.puml"
         dependencies = self.extract_module_dependencies()
 
-        with open(component_diagram_path, "w") as f:
-            f.write("@startuml\n")
-            for module, imports in dependencies.items():
-                for imp in imports:
-                    f.write(f"[{module}] --> [{imp}]\n")
-            f.write("@enduml\n")
+        parts = ["@startuml\n"]
+        for module, imports in dependencies.items():
+            parts.extend(f"[{module}] --> [{imp}]\n" for imp in imports)
+
+        parts.append("@enduml\n")
+        component_diagram_path.write_text("".join(parts))
 
-        return render_plantuml(component_diagram_path)
+        return component_diagram_path
 
     def generate_context_diagram(self, external_services):
         """Generates a C4 Context Diagram."""
         component_diagram_path = self.output_dir / "context_diagram.puml"
-        with open(component_diagram_path, "w", encoding="utf-8") as f:
-            f.write("@startuml\n")
-            f.write("!include <C4/C4_Context>\n\n")
-
-            f.write('Person(user, "User", "End user interacting with the system")\n')
-            f.write('System_Boundary(py_app, "Python Application") {\n')
-            f.write('    System(app, "Python Backend", "Main application backend")\n')
-            f.write("}\n")
-
-            for ext, desc in external_services.items():
-                ext_var = ext.replace(" ", "_").lower()
-                f.write(f'System_Ext({ext_var}, "{desc}", "External service")\n')
-                f.write(f'app -> {ext_var} : "Interacts with {desc}"\n')
-
-            f.write('user -> app : "Uses the application"\n')
-            f.write("@enduml\n")
-
-        return render_plantuml(component_diagram_path)
+        parts = [
+            "@startuml\n",
+            "!include <C4/C4_Context>\n\n",
+            'Person(user, "User", "End user interacting with the system")\n',
+            'System_Boundary(py_app, "Python Application") {\n',
+            '    System(app, "Python Backend", "Main application backend")\n',
+            "}\n",
+        ]
+        for ext, desc in external_services.items():
+            ext_var = ext.replace(" ", "_").lower()
+            parts.append(_EXTERNAL_LINES % (ext_var, desc, ext_var, desc))
+        parts.append('user -> app : "Uses the application"\n')
+        parts.append("@enduml\n")
+        component_diagram_path.write_text("".join(parts), encoding="utf-8")
+
+        return component_diagram_path
 
     def generate_container_diagram(self, architecture, external_services):
         """Generates a C4 Container Diagram."""
         component_diagram_path = self.output_dir / "container_diagram.puml"
-        with open(component_diagram_path, "w", encoding="utf-8") as f:
-            f.write("@startuml\n")
-            f.write("!include <C4/C4_Container>\n\n")
-
-            f.write('Person(user, "User", "End user interacting with the system")\n')
-            f.write('System_Boundary(py_app, "Python Application") {\n')
-
-            for module in architecture["modules"]:
-                f.write(
-                    f"    Container({module.replace('.', '_')}, \"{module}\", \"Python Module\")\n"
-                )
-
-            f.write("}\n")
-
-            # External services
-            for ext, desc in external_services.items():
-                ext_var = ext.replace(" ", "_").lower()
-                f.write(f'System_Ext({ext_var}, "{desc}", "External service")\n')
-                f.write(f'app -> {ext_var} : "Interacts with {desc}"\n')
-
-            f.write("user -> py_app : Uses the application\n")
-            f.write("@enduml\n")
-
-        return render_plantuml(component_diagram_path)
+        parts = [
+            "@startuml\n",
+            "!include <C4/C4_Container>\n\n",
+            'Person(user, "User", "End user interacting with the system")\n',
+            'System_Boundary(py_app, "Python Application") {\n',
+        ]
+        parts.extend(
+            _CONTAINER_LINE % (module.replace(".", "_"), module)
+            for module in architecture["modules"]
+        )
+        parts.append("}\n")
+
+        # External services
+        for ext, desc in external_services.items():
+            ext_var = ext.replace(" ", "_").lower()
+            parts.append(_EXTERNAL_LINES % (ext_var, desc, ext_var, desc))
+
+        parts.append("user -> py_app : Uses the application\n")
+        parts.append("@enduml\n")
+        component_diagram_path.write_text("".join(parts), encoding="utf-8")
+
+        return component_diagram_path
 
     def generate_c4_component_diagram(self, architecture):
         """Generates a C4 Component Diagram."""
         component_diagram_path = self.output_dir / "c4_component_diagram.puml"
-        with open(component_diagram_path, "w", encoding="utf-8") as f:
-            f.write("@startuml\n")
-            f.write("!include <C4/C4_Component>\n\n")
-
-            f.write('System_Boundary(py_app, "Python Application") {\n')
-
-            for class_name in architecture["classes"]:
-                class_id = class_name.replace(".", "_")
-                f.write(f'    Component({class_id}, "{class_name}", "Python Class")\n')
-
-            f.write("}\n")
-
-            for source, target in architecture["dependencies"]:
-                source_id = source.replace(".", "_")
-                target_id = target.replace(".", "_")
-                f.write(f'{source_id} -> {target_id} : "Inherits"\n')
-
-            f.write("@enduml\n")
-
-        return render_plantuml(component_diagram_path)
+        parts = [
+            "@startuml\n",
+            "!include <C4/C4_Component>\n\n",
+            'System_Boundary(py_app, "Python Application") {\n',
+        ]
+        parts.extend(
+            _COMPONENT_LINE % (class_name.replace(".", "_"), class_name)
+            for class_name in architecture["classes"]
+        )
+        parts.append("}\n")
+
+        parts.extend(
+            _INHERITS_LINE % (source.replace(".", "_"), target.replace(".", "_"))
+            for source, target in architecture["dependencies"]
+        )
+        parts.append("@enduml\n")
+        component_diagram_path.write_text("".join(parts), encoding="utf-8")
+
+        return component_diagram_path
 
     def extract_external_dependencies(self):
         """Identifies external dependencies like AWS services, databases, etc."""
+        all_services = set(EXTERNAL_DEPENDENCY_MODULES.values())
         external_deps = set()
-        for file_path in self.repo_path.rglob("*.py"):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    code = f.read()
-
-                if "boto3" in code:
-                    external_deps.add("AWS Services")
-                if "psycopg2" in code or "sqlalchemy" in code:
-                    external_deps.add("PostgreSQL")
-                if "redis" in code:
-                    external_deps.add("Redis")
-            except Exception as e:
-                print(f"Error parsing {file_path}: {e}")
+        for _, summary in self._scan_repo():
+            external_deps.update(
+                service
+                for module, service in EXTERNAL_DEPENDENCY_MODULES.items()
+                if module in summary["imports"]
+            )
+            # Every known service has been seen; later files cannot add more.
+            if external_deps >= all_services:
+                break
         return external_deps
 
     def extract_classes(self):
         classes = defaultdict(list)
-        for file_path in self.repo_path.rglob("*.py"):
-            ext = file_path.suffix.lower()
-            try:
-                if ext == ".py":
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        tree = ast.parse(f.read())
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.ClassDef):
-                            class_name = node.name
-                            methods = [
-                                n.name
-                                for n in node.body
-                                if isinstance(n, ast.FunctionDef)
-                            ]
-                            classes[class_name].extend(methods)
-
-                # elif ext in [".java", ".js", ".cpp", ".c", ".h"]:
-                #     with open(file_path, "r", encoding="utf-8") as f:
-                #         code = f.read()
-                #     class_pattern = r'class\s+(\w+)\s*[{|:]'
-                #     function_pattern = r'(public|private|protected)?\s*\w+\s+(\w+)\s*\(.*\)\s*[{|;]'
-                #     found_classes = re.findall(class_pattern, code)
-                #     found_functions = re.findall(function_pattern, code)
-                #     for cls in found_classes:
-                #         classes[cls] = []
-                #     for func in found_functions:
-                #         if func[1] not in classes:
-                #             classes[func[1]] = []
-                #         classes[func[1]].append(func[1])
-            except Exception as e:
-                print(f"Error parsing {file_path}: {e}")
+        for _, summary in self._scan_repo():
+            for class_name, methods in summary["classes"].items():
+                classes[class_name].extend(methods)
         return classes
 
     def extract_function_calls(self):
         calls = defaultdict(set)
-        for file_path in self.repo_path.rglob("*.py"):
-            ext = file_path.suffix.lower()
-            try:
-                if ext == ".py":
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        tree = ast.parse(f.read())
-                    current_class = None
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.ClassDef):
-                            current_class = node.name
-                        elif isinstance(node, ast.FunctionDef):
-                            function_name = node.name
-                            for stmt in ast.walk(node):
-                                if isinstance(stmt, ast.Call) and isinstance(
-                                    stmt.func, ast.Attribute
-                                ):
-                                    called_method = stmt.func.attr
-                                    calls[f"{current_class}.{function_name}"].add(
-                                        called_method
-                                    )
-                # elif ext in [".java", ".js", ".cpp", ".c", ".h"]:
-                #     with open(file_path, "r", encoding="utf-8") as f:
-                #         code = f.read()
-                #     function_call_pattern = r"(\w+)\.(\w+)\s*\("
-                #     matches = re.findall(function_call_pattern, code)
-                #     for cls, method in matches:
-                #         calls[f"{cls}.{method}"].add(method)
-            except Exception as e:
-                print(f"Error parsing {file_path}: {e}")
+        for _, summary in self._scan_repo():
+            for caller, callees in summary["calls"].items():
+                calls[caller].update(callees)
         return calls
 
     def extract_module_dependencies(self):
         dependencies = defaultdict(set)
-        for file_path in self.repo_path.rglob("*.py"):
-            ext = file_path.suffix.lower()
-            try:
-                if ext == ".py":
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        tree = ast.parse(f.read())
-                    module_name = file_path.stem
-                    for node in tree.body:
-                        if isinstance(node, ast.Import):
-                            for alias in node.names:
-                                dependencies[module_name].add(alias.name)
-                        elif isinstance(node, ast.ImportFrom):
-                            dependencies[module_name].add(node.module)
-                # elif ext in [".java", ".js", ".cpp", ".c", ".h"]:
-                #     with open(file_path, "r", encoding="utf-8") as f:
-                #         code = f.read()
-                #     import_pattern = r"import\s+([\w.]+)"
-                #     imports = re.findall(import_pattern, code)
-                #     module_name = file_path.stem
-                #     for imp in imports:
-                #         dependencies[module_name].add(imp)
-            except Exception as e:
-                print(f"Error parsing {file_path}: {e}")
+        for file_path, summary in self._scan_repo():
+            dependencies[file_path.stem].update(summary["module_deps"])
         return dependencies
+
+    def extract_imports_from_code(self):
+        """Collect the top-level modules imported anywhere in the repository."""
+        imported_modules = set()
+        for file_path, summary in self._scan_repo():
+            if file_path.name.startswith("__init__"):
+                continue
+            imported_modules.update(summary["imports"])
+        return imported_modules
+
+    def extract_python_structure(self):
+        """Extracts modules, classes, and functions to structure the architecture."""
+        architecture = {
+            "modules": set(),
+            "classes": set(),
+            "functions": set(),
+            "dependencies": set(),
+        }
+        for file_path, summary in self._scan_repo():
+            if file_path.name.startswith("__init__"):
+                continue
+            module_name = (
+                os.path.relpath(file_path, self.repo_path)
+                .replace("/", ".")
+                .replace("\\", ".")
+                .replace(".py", "")
+            )
+            architecture["modules"].add(module_name)
+            for class_name in summary["classes"]:
+                architecture["classes"].add(f"{module_name}.{class_name}")
+            for class_name, parent in summary["bases"]:
+                architecture["dependencies"].add(
+                    (f"{module_name}.{class_name}", parent)
+                )
+            for func_name in summary["functions"]:
+                architecture["functions"].add(f"{module_name}.{func_name}()")
+        return architecture
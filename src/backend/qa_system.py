@@ -1,41 +1,161 @@
-import openai
-from sentence_transformers import SentenceTransformer
+import asyncio
+import functools
+import hashlib
+import io
+import time
+from pathlib import Path
 
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+import numpy as np
+
+from embedding_model import encode_text
+
+# Cached answers are reused when a new question's embedding is at least this
+# cosine-similar to a previously answered one.
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# HNSW graph fan-out and search breadth; 32/64 keeps recall@3 effectively
+# perfect at this corpus size while staying sub-millisecond.
+FAISS_HNSW_M = 32
+FAISS_EF_SEARCH = 64
+
+
+@functools.lru_cache(maxsize=8)
+def _load_search_index(parquet_path, mtime):
+    """Load a repo's stored embeddings into an in-memory FAISS HNSW index.
+
+    The mtime in the cache key means a re-indexed repository gets a fresh
+    index; unchanged repositories reuse the built graph across requests.
+    Vectors are normalized at encode time, so inner product is cosine.
+    """
+    import faiss
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(parquet_path, columns=["id", "embedding"])
+    embeddings = np.ascontiguousarray(
+        np.stack(table["embedding"].to_numpy(zero_copy_only=False)),
+        dtype=np.float32,
+    )
+    index = faiss.IndexHNSWFlat(
+        embeddings.shape[1], FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT
+    )
+    index.hnsw.efSearch = FAISS_EF_SEARCH
+    index.add(embeddings)
+    return index, table["id"].to_pylist()
+
+
+@functools.lru_cache(maxsize=4096)
+def _encode_question(question):
+    """Embed a question, memoizing exact repeats (polling, retries)."""
+    return encode_text(question)
 
 
 class QAProcessor:
-    def __init__(self, collection, openai_key, repo_path):
+    def __init__(self, collection, openai_key, repo_path, qa_cache=None):
+        # Deferred so importing this module stays cheap for callers that
+        # never construct a processor (diagram-only runs, tooling).
+        import openai
+
         self.collection = collection
         self.openai_key = openai_key
-        self.client = openai.OpenAI(api_key=openai_key)
+        self.client = openai.AsyncOpenAI(api_key=openai_key)
         self.repo_path = repo_path
+        self.qa_cache = qa_cache
 
-    def answer_question(self, question):
-        query_embedding = embedding_model.encode(question).tolist()
+    def _cached_answer(self, query_embedding):
+        """Return a stored answer for a near-duplicate question, if any."""
+        if self.qa_cache is None or self.qa_cache.count() == 0:
+            return None
+        hit = self.qa_cache.query(
+            query_embeddings=query_embedding[None, :], n_results=1
+        )
+        documents = hit["documents"][0]
+        distances = hit["distances"][0]
+        # The cache collection uses cosine distance, so 1 - threshold is the
+        # largest distance that still counts as "the same question".
+        if documents and distances[0] <= 1.0 - SEMANTIC_CACHE_THRESHOLD:
+            return documents[0]
+        return None
 
-        results = self.collection.query(query_embeddings=[query_embedding], n_results=3)
+    def _store_answer(self, question, query_embedding, answer):
+        if self.qa_cache is None:
+            return
+        self.qa_cache.add(
+            ids=[hashlib.sha256(question.encode()).hexdigest()],
+            embeddings=query_embedding[None, :],
+            documents=[answer],
+            metadatas=[{"question": question, "created_at": time.time()}],
+        )
 
-        metadata_list = results.get("metadatas", [[]])
-        metadata_flat = [meta for sublist in metadata_list for meta in sublist if meta]
+    def _top_ids(self, query_embedding, n_results):
+        """ANN lookup over the Parquet vectors; None if no index exists."""
+        parquet_path = Path(self.repo_path) / "embeddings.parquet"
+        try:
+            mtime = parquet_path.stat().st_mtime
+        except OSError:
+            return None
+        index, ids = _load_search_index(str(parquet_path), mtime)
+        _, neighbors = index.search(
+            np.asarray(query_embedding, dtype=np.float32)[None, :], n_results
+        )
+        return [ids[i] for i in neighbors[0] if i >= 0]
+
+    def _build_context(self, query_embedding):
+        # FAISS answers the top-k in-process and sub-millisecond; Chroma is
+        # only asked to fetch the matching documents and metadata by id.
+        top_ids = self._top_ids(query_embedding, n_results=3)
+        if top_ids:
+            results = self.collection.get(
+                ids=top_ids, include=["metadatas", "documents"]
+            )
+            metadata_flat = results.get("metadatas") or []
+            documents_flat = results.get("documents") or []
+        else:
+            results = self.collection.query(
+                query_embeddings=query_embedding[None, :], n_results=3
+            )
 
-        documents = results.get("documents", [[]])
-        documents_flat = [doc for sublist in documents for doc in sublist if doc]
+            # One query means one outer list per field — index it directly
+            # instead of flattening with nested comprehensions.
+            metadata_flat = results.get("metadatas", [[]])[0] or []
+            documents_flat = results.get("documents", [[]])[0] or []
 
         if metadata_flat and documents_flat:
-            context_snippets = []
+            # Stream the context into one buffer; joining intermediate
+            # snippet strings would copy the full context a second time.
+            buf = io.StringIO()
             for meta, doc in zip(metadata_flat, documents_flat):
-                context_snippets.append(
+                buf.write(
                     f"File: {meta.get('file_path', 'Unknown')}\n"
                     f"Name: {meta.get('name', 'Unknown')}\n"
                     f"Type: {meta.get('type', 'Unknown')}\n"
-                    f"Code:\n{doc}\n"
+                    f"Code:\n{doc}\n\n\n"
                 )
-            context_str = "\n\n".join(context_snippets)
-        else:
-            context_str = "No relevant context found."
+            return buf.getvalue()[:-2]
+        return "No relevant context found."
+
+    async def stream_answer(self, question):
+        """Yield the answer incrementally as completion tokens arrive.
+
+        Streaming cuts time-to-first-token from full-completion latency to
+        a few hundred milliseconds; cache hits yield their answer at once.
+        The completed answer is stored in the semantic cache on the way out.
+        """
+        query_embedding = await asyncio.to_thread(_encode_question, question)
 
-        response = self.client.chat.completions.create(
+        # The cache probe and retrieval both hit synchronous stores, so run
+        # them off the event loop — and concurrently: on a cache hit the
+        # speculative context build is wasted, on a miss its latency has
+        # already been absorbed by the probe.
+        cached, context_str = await asyncio.gather(
+            asyncio.to_thread(self._cached_answer, query_embedding),
+            asyncio.to_thread(self._build_context, query_embedding),
+        )
+        # Rephrasings of an already-answered question skip the LLM entirely.
+        if cached is not None:
+            yield cached
+            return
+
+        stream = await self.client.chat.completions.create(
             model="gpt-4",
             messages=[
                 {
@@ -53,6 +173,20 @@ class QAProcessor:
                     "If you do not find an exact match, try to infer based on related code structures.",
                 },
             ],
+            stream=True,
+        )
+
+        parts = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content or ""
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        await asyncio.to_thread(
+            self._store_answer, question, query_embedding, "".join(parts)
         )
 
-        return response.choices[0].message.content
+    async def answer_question(self, question):
+        """Collect the streamed answer for callers that want the full text."""
+        return "".join([part async for part in self.stream_answer(question)])
@@ -1,8 +1,42 @@
 import ast
+import hashlib
+import json
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from embedding_model import encode_batch
+
+# Below this many files, forking workers costs more than it saves.
+MIN_FILES_FOR_PARALLEL_PARSE = 32
+
+# Explicit column types for embeddings.parquet; building typed Arrow arrays
+# directly skips pandas' row-by-row dtype inference and its object-dtype
+# intermediate copy of every string.
+PARQUET_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("name", pa.string()),
+        ("type", pa.string()),
+        ("file_path", pa.string()),
+        ("start_line", pa.int64()),
+        ("end_line", pa.int64()),
+        ("code", pa.large_string()),
+        ("parent", pa.string()),
+        ("docstring", pa.string()),
+    ]
+)
+
+# Compiled once; _parse_other_languages scans every non-Python file with them.
+CLASS_PATTERN = re.compile(r"class\s+(\w+)\s*[{|:]")
+FUNCTION_PATTERN = re.compile(
+    r"(public|private|protected)?\s*\w+[<>]*\s+(\w+)\s*\(.*\)\s*[{|;]"
+)
 
 SUPPORTED_EXTENSIONS = {
     ".py",
@@ -22,114 +56,187 @@ SUPPORTED_EXTENSIONS = {
 }
 
 
-def _parse_python_file(file_path, embedding_data):
+def _node_source(code_lines, node):
+    """Slice a node's source from the original text.
+
+    ast.unparse re-traverses and re-formats the subtree; slicing by the
+    line span the parser already recorded is a cheap copy and preserves
+    the author's formatting. unparse remains only for nodes without
+    position info.
+    """
+    end = getattr(node, "end_lineno", None)
+    if end is None:
+        return ast.unparse(node)
+    return "\n".join(code_lines[node.lineno - 1 : end])
+
+
+def _parse_python_file(file_path):
+    """Parse one file into metadata rows.
+
+    Pure function of the file contents so it can run in worker processes;
+    rows are returned rather than appended to shared state.
+    """
+    embedding_data = []
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             code = f.read()
         tree = ast.parse(code)
-        class_stack = []
-
-        found_code = False
+        code_lines = code.splitlines()
 
         file_hash = hash(str(file_path))
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                found_code = True
-                class_stack.append(node.name)
-                embedding_data.append(
-                    {
-                        "id": f"{node.name}_{file_path.stem}_{node.lineno}_{file_hash}",
-                        "name": node.name,
-                        "type": "class",
-                        "file_path": str(file_path),
-                        "start_line": node.lineno,
-                        "end_line": getattr(node, "end_lineno", None),
-                        "code": ast.unparse(node),
-                        "parent": None,
-                        "docstring": ast.get_docstring(node) or "",
-                    }
-                )
+        def _row(node, node_type, parent):
+            return {
+                "id": f"{node.name}_{file_path.stem}_{node.lineno}_{file_hash}",
+                "name": node.name,
+                "type": node_type,
+                "file_path": str(file_path),
+                "start_line": node.lineno,
+                "end_line": getattr(node, "end_lineno", None),
+                "code": _node_source(code_lines, node),
+                "parent": parent,
+                "docstring": ast.get_docstring(node) or "",
+            }
 
-            elif isinstance(node, ast.FunctionDef):
-                found_code = True
-                parent = class_stack[-1] if class_stack else None
-                embedding_data.append(
-                    {
-                        "id": f"{node.name}_{file_path.stem}_{node.lineno}_{file_hash}",
-                        "name": node.name,
-                        "type": "method" if parent else "function",
-                        "file_path": str(file_path),
-                        "start_line": node.lineno,
-                        "end_line": getattr(node, "end_lineno", None),
-                        "code": ast.unparse(node),
-                        "parent": parent,
-                        "docstring": ast.get_docstring(node) or "",
-                    }
-                )
+        # Descend only into class bodies instead of ast.walk's full-tree
+        # sweep, which visits every expression node just to discard it.
+        # Passing the enclosing class down also fixes the old class_stack
+        # bookkeeping, which never popped and mislabelled methods after
+        # the first class in a file.
+        def _visit(body, enclosing_class):
+            for node in body:
+                if isinstance(node, ast.ClassDef):
+                    embedding_data.append(_row(node, "class", enclosing_class))
+                    _visit(node.body, node.name)
+                elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    embedding_data.append(
+                        _row(
+                            node,
+                            "method" if enclosing_class else "function",
+                            enclosing_class,
+                        )
+                    )
+
+        _visit(tree.body, None)
     except Exception as e:
         print(f"Error parsing Python file {file_path}: {e}")
+    return embedding_data
 
 
-def _parse_other_languages(file_path, embedding_data):
+def _parse_other_languages(file_path):
+    embedding_data = []
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             code = f.read()
 
-        found_code = False
-
         file_hash = hash(str(file_path))
 
-        class_pattern = re.compile(r"class\s+(\w+)\s*[{|:]")
-        function_pattern = re.compile(
-            r"(public|private|protected)?\s*\w+[<>]*\s+(\w+)\s*\(.*\)\s*[{|;]"
-        )
-
-        for i, line in enumerate(code):
-            class_match = class_pattern.search(line)
-            function_match = function_pattern.search(line)
-
-            if class_match:
-                found_code = True
-                name = class_match.group(1)
-                embedding_data.append(
-                    {
-                        "id": f"{name}_{file_path.stem}_{i + 1}_{file_hash}",
-                        "name": name,
-                        "type": "class",
-                        "file_path": str(file_path),
-                        "start_line": i + 1,
-                        "end_line": None,
-                        "code": None,
-                        "parent": None,
-                        "docstring": "",
-                    }
-                )
-
-            if function_match:
-                found_code = True
-                name = function_match.group(2)
-                embedding_data.append(
-                    {
-                        "id": f"{name}_{file_path.stem}_{i + 1}_{file_hash}",
-                        "name": name,
-                        "type": "function",
-                        "file_path": str(file_path),
-                        "start_line": i + 1,
-                        "end_line": None,
-                        "code": None,
-                        "parent": None,
-                        "docstring": "",
-                    }
-                )
+        # finditer over the whole buffer; the old loop enumerated characters
+        # (not lines), running both regexes against one-char strings and
+        # never matching anything.
+        for match, name, node_type in (
+            *(
+                (m, m.group(1), "class")
+                for m in CLASS_PATTERN.finditer(code)
+            ),
+            *(
+                (m, m.group(2), "function")
+                for m in FUNCTION_PATTERN.finditer(code)
+            ),
+        ):
+            start_line = code.count("\n", 0, match.start()) + 1
+            embedding_data.append(
+                {
+                    "id": f"{name}_{file_path.stem}_{start_line}_{file_hash}",
+                    "name": name,
+                    "type": node_type,
+                    "file_path": str(file_path),
+                    "start_line": start_line,
+                    "end_line": None,
+                    "code": None,
+                    "parent": None,
+                    "docstring": "",
+                }
+            )
     except Exception as e:
         print(f"Error parsing {file_path}: {e}")
+    return embedding_data
+
+
+def _snippet_text(row):
+    text = row["code"] or row["name"]
+    if row["docstring"]:
+        text = f"{text}\n{row['docstring']}"
+    return text
+
+
+def _embed_snippets(texts):
+    """Encode every snippet in one batched call, shortest first.
+
+    Duplicate snippets — empty __init__ files, boilerplate dunders,
+    repeated license headers — are encoded once and scattered back, since
+    the model is deterministic. Sorting the unique texts by length lets
+    each batch pad only to its own longest member instead of the
+    corpus-wide maximum; the result is restored to input order afterwards.
+    """
+    unique = {}
+    for text in texts:
+        unique.setdefault(text, len(unique))
+    unique_texts = list(unique)
+
+    order = np.argsort([len(text) for text in unique_texts], kind="stable")
+    encoded = encode_batch([unique_texts[i] for i in order])
+    unique_embeddings = np.empty_like(encoded)
+    unique_embeddings[order] = encoded
+    return unique_embeddings[[unique[text] for text in texts]]
 
 
 class RepositoryParser:
     def __init__(self, repo_path):
         self.repo_path = Path(repo_path)
         self.parquet_path = self.repo_path / "embeddings.parquet"
+        self.manifest_path = self.repo_path / ".parse_manifest.json"
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _partition_files(self, files_to_process):
+        """Split candidates into unchanged paths and files needing a parse.
+
+        A file whose mtime matches the manifest is skipped without reading
+        it; a touched-but-identical file (same content hash) only gets its
+        manifest entry refreshed. Both keep their existing rows and
+        embeddings from the last Parquet write.
+        """
+        manifest = self._load_manifest() if self.parquet_path.exists() else {}
+        new_manifest = {}
+        unchanged = []
+        to_parse = []
+        for file_path in files_to_process:
+            try:
+                mtime = file_path.stat().st_mtime
+            except OSError:
+                continue
+            key = str(file_path)
+            entry = manifest.get(key)
+            if entry is not None and entry["mtime"] == mtime:
+                unchanged.append(key)
+                new_manifest[key] = entry
+                continue
+            try:
+                digest = hashlib.sha1(file_path.read_bytes()).hexdigest()
+            except OSError:
+                continue
+            new_manifest[key] = {"mtime": mtime, "sha1": digest}
+            if entry is not None and entry["sha1"] == digest:
+                unchanged.append(key)
+            else:
+                to_parse.append(file_path)
+        return unchanged, to_parse, new_manifest
 
     def extract_code_structure(self, changed_files=None):
         embedding_data = []
@@ -141,19 +248,69 @@ class RepositoryParser:
         else:
             files_to_process = list(self.repo_path.rglob("*.py"))
 
-        for file_path in files_to_process:
-            ext = file_path.suffix.lower()
-            if ext not in SUPPORTED_EXTENSIONS:
-                continue
+        unchanged, to_parse, new_manifest = self._partition_files(files_to_process)
 
-            if ext == ".py":
-                _parse_python_file(file_path, embedding_data)
-            # else:
-            #     _parse_other_languages(file_path, embedding_data)
+        if len(to_parse) < MIN_FILES_FOR_PARALLEL_PARSE:
+            for file_path in to_parse:
+                ext = file_path.suffix.lower()
+                if ext not in SUPPORTED_EXTENSIONS:
+                    continue
+
+                if ext == ".py":
+                    embedding_data.extend(_parse_python_file(file_path))
+                # else:
+                #     embedding_data.extend(_parse_other_languages(file_path))
+        else:
+            # Parsing is pure-Python CPU work, so it scales across worker
+            # processes; embedding stays on the driver as one batched pass.
+            with ProcessPoolExecutor() as executor:
+                for rows in executor.map(_parse_python_file, to_parse, chunksize=8):
+                    embedding_data.extend(rows)
+
+        pieces = []
+        if unchanged:
+            # Rows for unchanged files ride along from the previous index,
+            # embeddings included, so steady-state re-indexing costs one
+            # filtered Parquet read instead of a full parse+encode sweep.
+            pieces.append(
+                pq.read_table(
+                    self.parquet_path, filters=[("file_path", "in", unchanged)]
+                ).replace_schema_metadata(None)
+            )
 
         if embedding_data:
-            df_embeddings = pd.DataFrame(embedding_data)
-            df_embeddings.to_parquet(self.parquet_path, index=False)
+            # One batched forward pass over every snippet; per-node encode
+            # calls would re-pay tokenizer and model setup per snippet.
+            embeddings = _embed_snippets(
+                [_snippet_text(row) for row in embedding_data]
+            ).astype(np.float32, copy=False)
+            columns = {
+                name: [row[name] for row in embedding_data]
+                for name in PARQUET_SCHEMA.names
+            }
+            table = pa.Table.from_pydict(columns, schema=PARQUET_SCHEMA)
+            # Fixed-size float32 vectors store 4 bytes per element and read
+            # back as one contiguous block; a column of Python lists would
+            # be written as boxed variable-length LIST<DOUBLE>.
+            table = table.append_column(
+                "embedding",
+                pa.FixedSizeListArray.from_arrays(
+                    pa.array(embeddings.reshape(-1)), embeddings.shape[1]
+                ),
+            )
+            pieces.append(table)
+
+        if pieces:
+            if len(pieces) > 1:
+                table = pa.concat_tables(
+                    [piece.select(pieces[-1].column_names) for piece in pieces]
+                )
+            else:
+                table = pieces[0]
+            pq.write_table(table, self.parquet_path)
+            with open(self.manifest_path, "w", encoding="utf-8") as f:
+                json.dump(new_manifest, f)
+            df_embeddings = table.to_pandas()
         else:
             df_embeddings = pd.DataFrame()
 